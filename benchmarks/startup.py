@@ -0,0 +1,70 @@
+"""
+Session start-up benchmark
+
+Times how long it takes from opening a session to receiving its document
+(everything the browser needs for the first paint) with 1, 10 and 50
+sessions opened at once. Browser rendering time is not included.
+
+Start the app first, from the bokodapviewer directory:
+
+    bokeh serve App.py
+
+then run:
+
+    python startup.py [--url http://localhost:5006/App] [--sessions 1 10 50]
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bokeh.client import pull_session
+
+
+def open_session(url):
+
+    """
+    Open a session and return the time taken to receive its document
+    """
+
+    start = time.perf_counter()
+    session = pull_session(url=url)
+    elapsed = time.perf_counter() - start
+    session.close()
+
+    return elapsed
+
+
+def run(url, num_sessions):
+
+    """
+    Open a number of sessions at once and return the times taken
+    """
+
+    with ThreadPoolExecutor(max_workers=num_sessions) as executor:
+        times = list(executor.map(open_session, [url] * num_sessions))
+
+    return times
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description='bokodapviewer session start-up benchmark')
+    parser.add_argument('--url', default='http://localhost:5006/App', help='app URL')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 10, 50],
+                        help='numbers of concurrent session opens')
+    args = parser.parse_args()
+
+    # The first session in the server process also parses the config file
+    print('First session: {:.1f} ms'.format(open_session(args.url) * 1000))
+
+    print('Sessions   Median (ms)   Max (ms)')
+    for num_sessions in args.sessions:
+        times = run(args.url, num_sessions)
+        print('{:8d}   {:11.1f}   {:8.1f}'.format(num_sessions, statistics.median(times) * 1000,
+                                                   max(times) * 1000))
+
+
+if __name__ == '__main__':
+    main()
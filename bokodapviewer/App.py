@@ -3,30 +3,36 @@ Main bokodapviewer application class definition
 """
 
 import os
+import time
+import threading
 from collections import OrderedDict
-import xml.etree.ElementTree as et
+from functools import partial
 
 import numpy
 
 from sodapclient import Handler
 
-from bokcolmaps.CMSlicer2D import CMSlicer2D
-from bokcolmaps.CMSlicer3D import CMSlicer3D
-
-from bokeh.models.widgets.tables import DataTable, TableColumn, IntEditor
+from bokeh.models.widgets.tables import DataTable, TableColumn, IntEditor, SelectEditor
 from bokeh.models.widgets.markups import Paragraph, Div
 from bokeh.models.layouts import TabPanel, Tabs
 from bokeh.models.widgets.buttons import Button
 from bokeh.models.widgets.inputs import TextInput, Select
-from bokeh.models.widgets import CheckboxGroup
+from bokeh.models.widgets import CheckboxGroup, Slider
 from bokeh.models.layouts import Row, Column
 from bokeh.models.sources import ColumnDataSource
-from bokeh.plotting import figure
 from bokeh.io import curdoc
+from bokeh.document import without_document_lock
 
 from numpy import float32
 
-from bokcolmaps.interp_data import interp_data
+from bokodapviewer.ConfigCache import ConfigCache
+from bokodapviewer.VarIndex import VarIndex
+from bokodapviewer.StreamReducer import StreamReducer
+from bokodapviewer.SlicePrefetcher import SlicePrefetcher
+from bokodapviewer.SharedArray import SharedArray
+from bokodapviewer.ComputePool import ComputePool, apply_attr_values
+from bokodapviewer.IngestStats import IngestStats
+from bokodapviewer.MappedVolume import MappedVolume
 
 
 class App:
@@ -34,10 +40,17 @@ class App:
     """
     A simple OpenDAP data viewer using Bokeh.
     Run with the bokeh server at the command line: bokeh serve --show App.py
+    The bokodapviewer package must be installed first (pip install . or
+    pip install -e . in a source checkout): App.py and the compute pool's
+    worker processes import its other modules, and bokeh serve does not put
+    the package on the path. An older installed version would be used in
+    preference to the source.
 
     Display data with the following steps:
     1. Enter an OpenDAP URL and press the 'Open URL' button. The DDS will be
-    loaded and displayed.
+    loaded and displayed. The variables shown can be filtered by name (the
+    name containing or starting with the search text) and by dimension name,
+    and are displayed a page at a time.
     2. Select a variable (i.e. select a row in the DDS table) and press the
     'Get variable details' button. The DAS and available dimensions will be
     displayed.
@@ -63,10 +76,38 @@ class App:
     tolerance percentage can be set: this allows for slight non-uniformity
     in an axis grid (e.g. precision errors) without invoking interpolation.
 
+    Dimensions beyond those plotted can either be reduced to singletons or
+    collapsed by setting a reduction (mean, min, max, std or count, all
+    ignoring NaNs) in the Reduction column of the Dimensions table. Reduced
+    dimensions are not offered as plot axes, and the reductions are shown
+    in the plot labels. The data are downloaded in
+    chunks along the first reduced dimension and accumulated, so memory use
+    is limited to one chunk plus the result; the maximum number of values
+    per chunk is set in the config file. Where several dimensions are
+    reduced the reductions are applied from the last dimension to the first.
+
     When viewing the data the z axis limits can be fixed and all three axes
     can be reversed using the controls below the plot. The 'Update Display'
     button must be pressed to update the plot with the new settings.
 
+    If the z axis limits are not fixed they are set automatically, either to
+    the minimum and maximum of the data or to a percentile range (which is
+    less affected by outliers), optionally for each slice separately. The
+    limits are estimated from statistics gathered while the attributes are
+    applied, so no further pass over the data is needed. When streaming
+    slices, limits that are not per slice cover the slices fetched so far
+    and are widened as more arrive.
+
+    2D plots with a slider can be animated with the Play/Pause button at the
+    frame rate entered. If 'Stream slices' is checked before getting the
+    data, the volume is not downloaded up front: slices are fetched in the
+    background into a buffer ahead of the playhead and only the current
+    slice is sent to the browser. Frames dropped because the server fell
+    behind the frame rate, and buffer underruns (slices not fetched in
+    time), are reported next to the controls. A slice chosen with the slider
+    that is not in the buffer is fetched next and shown when it arrives. The
+    number of slices buffered ahead is set in the config file.
+
     Attributes such as scale factors, offsets, missing and fill values are
     automatically applied. The corresponding names are stored in the config
     file. More than one can be stored, e.g. simply add a config line
@@ -74,6 +115,27 @@ class App:
     name new_scale_factor. More than one may be needed if different DAS have
     different names for the same thing.
 
+    If 'Out-of-core volume' is checked before getting the data for a 2D plot
+    with a slider, the volume is downloaded in chunks of slices into a
+    temporary memory-mapped file on disk instead of being held in memory, so
+    volumes larger than the server's memory can be viewed. The file is laid
+    out slice by slice along the slider dimension: moving the slider,
+    playing the slices and transposing them read only the slice shown.
+    Clicking on the plot shows a line plot through all the slices at that
+    point, and each pair of clicks sets the ends of a track for a section
+    through the slices, as for other 2D plots with a slider; these read only
+    the values on the line or around the track. The maximum number of values
+    per chunk and the directory for the file are set in the config file. The
+    directory must be on disk rather than a RAM-backed tmpfs; by default
+    /var/tmp is used if it is writable, otherwise the system temporary
+    directory.
+
+    Applying attributes, transposing and interpolating the data are done in
+    a pool of worker processes shared by all sessions in the server process,
+    with the arrays passed through shared memory. The number of processes is
+    set in the config file (0 to do the work in the server process itself).
+    The Get data and Update Display buttons are disabled while this is done.
+
     Other config file settings include the table and plot sizes and whether or
     not a plot cursor readout is required. The app can cope with proxy servers:
     create a simple text file with the proxy details (see the sodapclient
@@ -93,19 +155,66 @@ class App:
         self.attr_names = {'ScaleFactorName': [], 'OffsetName': [],
                            'FillValueName': [], 'MissingValueName': []}
 
+        # Maximum number of values per download when reducing dimensions
+        self.reduction_chunk_size = 4000000
+        self.red_dims = []
+
+        # Maximum number of values per download and directory for
+        # out-of-core volumes
+        self.mapped_chunk_size = 4000000
+        self.mapped_dir = None
+        self.volume = None
+
+        # Number of slices buffered ahead of the playhead when streaming
+        self.prefetch_depth = 8
+
+        # Number of processes for data transforms
+        self.compute_procs = 2
+
+        # Number of variables per page of the DDS table
+        self.dds_page_size = 100
+        self.var_index = None
+        self.dds_matches = []
+        self.dds_page = 0
+
+        # Playback state
+        self.doc = curdoc()
+        self.fetch_lock = threading.Lock()  # Serialises use of the handler
+        self.play_stream = False
+        self.prefetcher = None
+        self.play_cb = None
+        self.play_disp = None
+
         # Read the configuration file to get data sources etc
         self.get_config()
 
+        # Process pool shared by all sessions
+        self.pool = ComputePool.get(self.compute_procs)
+        self.attrs_pending = False
+        self.job_id = 0  # Results of older jobs are dropped
+        self.job_running = False
+        self.get_data_ok = False
+
+        # Ingest statistics for automatic colour limits
+        self.stats = {}
+        self.stats_axis = None
+        self.lims_pcts = OrderedDict([('Min/max', (0, 100)), ('1-99 percentile', (1, 99)),
+                                      ('2-98 percentile', (2, 98)), ('5-95 percentile', (5, 95))])
+
         # Set up the gui
         self.setup_gui()
+        self.stop_playback()  # Initialise the playback state
+
+        self.doc.on_session_destroyed(self.session_destroyed)
 
     def get_config(self):
 
         """
-        Read in the xml configuration file
+        Read in the xml configuration file (parsed once per server process
+        unless the file changes)
         """
 
-        root = et.parse(self.config_file).getroot()
+        root = ConfigCache.get(self.config_file)
 
         self.col_map_path = None
 
@@ -131,6 +240,27 @@ class App:
                 self.line_plot_size = [int(child.attrib['height']),
                                        int(child.attrib['width'])]
 
+            if child.tag == 'ReductionChunkSize':
+                self.reduction_chunk_size = int(child.text)
+
+            if child.tag == 'MappedChunkSize':
+                self.mapped_chunk_size = int(child.text)
+
+            if (child.tag == 'MappedVolumeDir') and (child.text != 'None'):
+                self.mapped_dir = child.text
+
+            if child.tag == 'PrefetchDepth':
+                self.prefetch_depth = int(child.text)
+
+            if child.tag == 'ComputeProcesses':
+                self.compute_procs = int(child.text)
+
+            if child.tag == 'TablePageSize':
+                self.dds_page_size = int(child.text)
+                if self.dds_page_size < 1:
+                    print('App warning: table page size must be at least 1: reverting to 100.')
+                    self.dds_page_size = 100
+
             if (child.tag in self.attr_names.keys()) and \
                (child.text not in self.attr_names[child.tag]):
                 self.attr_names[child.tag].append(child.text)
@@ -171,6 +301,23 @@ class App:
                               sortable=False, height=self.table_size[0],
                               width=self.table_size[1], index_position=None)
 
+        # DDS search and paging
+
+        self.search_box = TextInput(title='Search variables:', width=self.table_size[1] // 2)
+        self.search_box.on_change('value_input', self.search_changed)
+        self.search_mode = Select(title='Match:', options=['Name contains', 'Name starts with'],
+                                  value='Name contains', width=self.table_size[1] // 4)
+        self.search_mode.on_change('value', self.search_changed)
+        self.search_dim = Select(title='Dimension:', options=['Any'], value='Any',
+                                 width=self.table_size[1] // 4)
+        self.search_dim.on_change('value', self.search_changed)
+
+        self.prev_btn = Button(label='<', disabled=True, width=self.table_size[1] // 10)
+        self.prev_btn.on_click(self.prev_dds_page)
+        self.next_btn = Button(label='>', disabled=True, width=self.table_size[1] // 10)
+        self.next_btn.on_click(self.next_dds_page)
+        self.page_div = Div(text='', width=self.table_size[1] // 2)
+
         # DAS table
 
         odt = OrderedDict()
@@ -194,19 +341,24 @@ class App:
         odt['First Index'] = []
         odt['Interval'] = []
         odt['Last Index'] = []
+        odt['Reduction'] = []
         self.ds_select = ColumnDataSource(odt)
 
         cols = []
         for item in iter(odt):
             if item == 'Dimension':
                 cols.append(TableColumn(title=item, field=item))
+            elif item == 'Reduction':
+                cols.append(TableColumn(title=item, field=item,
+                                        editor=SelectEditor(options=['None'] + StreamReducer.ops)))
             else:
                 cols.append(TableColumn(title=item, field=item,
                                         editor=IntEditor(step=1)))
-        select_table = DataTable(source=self.ds_select, columns=cols,
-                                 selectable=True, sortable=True, editable=True,
-                                 height=self.table_size[0],
-                                 width=self.table_size[1], index_position=None)
+        self.select_cols = cols
+        self.select_table = DataTable(source=self.ds_select, columns=cols,
+                                      selectable=True, sortable=True, editable=True,
+                                      height=self.table_size[0],
+                                      width=self.table_size[1], index_position=None)
 
         # Selection and Visualisation panels
 
@@ -225,6 +377,8 @@ class App:
         self.get_data_btn.on_click(self.get_data)
 
         self.endian_chkbox = CheckboxGroup(labels=['Big Endian'], active=[0])
+        self.stream_chkbox = CheckboxGroup(labels=['Stream slices'], active=[])
+        self.mapped_chkbox = CheckboxGroup(labels=['Out-of-core volume'], active=[])
 
         self.interp_int_box = TextInput(title='Interpolation interval:', width=self.table_size[1] // 2)
         self.interp_tol_box = TextInput(title='Non-uniform tolerance (%):', value='1', width=self.table_size[1] // 2)
@@ -236,31 +390,45 @@ class App:
         self.zmin = TextInput(title='z minimum:', width=self.table_size[1] // 2)
         self.zmax = TextInput(title='z maximum:', width=self.table_size[1] // 2)
 
+        self.auto_lims = Select(title='Automatic z limits:', options=list(self.lims_pcts.keys()),
+                                value='Min/max', width=self.table_size[1] // 2)
+        self.slice_lims_chkbox = CheckboxGroup(labels=['Limits per slice'], active=[0],
+                                               width=self.table_size[1] // 2)
+
         self.stat_box = Div(text='<font color="green">Initialised OK</font>',
                             width=self.table_size[1] * 2)
 
         self.update_btn = Button(label='Update Display', width=self.table_size[1] // 2)
         self.update_btn.on_click(self.display_data)
 
+        self.play_btn = Button(label='Play', disabled=True, width=self.table_size[1] // 4)
+        self.play_btn.on_click(self.toggle_playback)
+        self.fps_box = TextInput(title='Frame rate (fps):', value='5', width=self.table_size[1] // 4)
+        self.fps_box.on_change('value', self.change_frame_rate)
+        self.play_stat = Div(text='', width=self.table_size[1])
+
         ws1 = Row(children=[Column(Div(text='<font color="blue">Dataset Descriptor Structure'),
-                                   dds_table), Div(), Column(self.get_var_btn, self.p_sel)])
+                                   Row(self.search_box, self.search_mode, self.search_dim),
+                                   dds_table, Row(self.prev_btn, self.next_btn, self.page_div)),
+                            Div(), Column(self.get_var_btn, self.p_sel)])
         ws2 = Row(children=[Column(Div(text='<font color="blue">Dataset Attribute Structure'),
                                    das_table), Div(),
-                            Column(Div(text='<font color="blue">Dimensions'), select_table)])
+                            Column(Div(text='<font color="blue">Dimensions'), self.select_table)])
         ws3 = Row(children=[self.get_pltops_btn, self.get_data_btn,
-                            self.endian_chkbox])
+                            self.endian_chkbox, self.stream_chkbox, self.mapped_chkbox])
         ws4 = Row(children=[Column(self.plot_ops, Row(self.interp_int_box,
                                                       self.interp_tol_box))])
-        wp1 = Row(children=[self.zmin, self.zmax])
+        wp1 = Row(children=[self.zmin, self.zmax, self.auto_lims, self.slice_lims_chkbox])
         wp2 = Row(children=[self.revx_chkbox, self.revy_chkbox,
                             self.revz_chkbox])
         wp3 = Row(children=[self.update_btn])
+        wp4 = Row(children=[self.play_btn, self.fps_box, self.play_stat])
 
         select_panel = TabPanel(title='Data Selection', child=Column(ws1, ws2, ws3, ws4))
 
         plot_panel = TabPanel(title='Data Visualisation', child=Column(Column(Div()),
                               Div(text='', width=self.main_plot_size[1], height=100),
-                              wp1, wp2, wp3))
+                              wp1, wp2, wp3, wp4))
 
         self.tabs = Tabs(tabs=[select_panel, plot_panel])
 
@@ -278,6 +446,8 @@ class App:
 
         self.stat_box.text = '<font color="blue">Opening URL...</font>'
 
+        self.stop_playback()
+
         try:
             self.odh = Handler(self.url.value)
         except:
@@ -290,29 +460,87 @@ class App:
                 '<font color="red">Error: no DDS found at URL</font>'
             return
 
-        var_names, var_types, var_dims, dim_names = [], [], [], []
-        for item, attr in sorted(self.odh.dds.items()):
-            var_names.append(item)
-            var_types.append(attr[0])
-            var_dims.append(attr[1])
-            dim_names.append(attr[2])
+        self.var_index = VarIndex(self.odh.dds)
 
-        odt = OrderedDict()
-        odt['Variable Name'] = var_names
-        odt['Type'] = var_types
-        odt['Dimensions'] = var_dims
-        odt['Dimension Names'] = dim_names
-        self.ds_dds.data = odt
+        self.search_dim.options = ['Any'] + self.var_index.dim_names
+        if self.search_dim.value not in self.search_dim.options:
+            self.search_dim.value = 'Any'
+        self.search_vars()
 
         self.get_var_btn.disabled = False
         # Disable these to avoid mismatch between DDS and stored data
         self.get_pltops_btn.disabled = True
-        self.get_data_btn.disabled = True
+        self.get_data_ok = False
+        self.update_buttons()
 
         self.stat_box.text = '<font color="green">URL opened OK.</font>'
 
         self.tabs.active = 0
 
+    def search_changed(self, attr, old, new):
+
+        """
+        Handle changes to the search settings
+        """
+
+        self.search_vars()
+
+    def search_vars(self):
+
+        """
+        Find the variables matching the search settings and show the first
+        page of them
+        """
+
+        if self.var_index is None:
+            return
+
+        dim_name = None if self.search_dim.value == 'Any' else self.search_dim.value
+        text = self.search_box.value_input
+        if text is None:
+            text = self.search_box.value
+
+        self.dds_matches = self.var_index.search(text, prefix=(self.search_mode.value == 'Name starts with'),
+                                                 dim_name=dim_name)
+        self.dds_page = 0
+        self.show_dds_page()
+
+    def show_dds_page(self):
+
+        """
+        Send the current page of matching variables to the DDS table
+        """
+
+        num_pages = max(1, -(-len(self.dds_matches) // self.dds_page_size))
+        self.dds_page = min(self.dds_page, num_pages - 1)
+
+        start = self.dds_page * self.dds_page_size
+        self.ds_dds.selected.indices = []
+        self.ds_dds.data = self.var_index.get_rows(self.dds_matches[start:start + self.dds_page_size])
+
+        self.prev_btn.disabled = self.dds_page == 0
+        self.next_btn.disabled = self.dds_page == num_pages - 1
+        self.page_div.text = 'Page ' + str(self.dds_page + 1) + ' of ' + str(num_pages) + \
+            ' (' + str(len(self.dds_matches)) + ' of ' + str(len(self.var_index)) + ' variables)'
+
+    def prev_dds_page(self):
+
+        """
+        Show the previous page of the DDS table
+        """
+
+        self.dds_page = max(0, self.dds_page - 1)
+        self.show_dds_page()
+
+    def next_dds_page(self):
+
+        """
+        Show the next page of the DDS table
+        """
+
+        self.dds_page += 1
+        self.show_dds_page()
+
     def get_var(self):
 
         """
@@ -323,6 +551,8 @@ class App:
 
         if len(sel) > 0:
 
+            self.stop_playback()
+
             # Attributes
 
             self.var_name = self.ds_dds.data['Variable Name'][sel[0]]
@@ -353,12 +583,18 @@ class App:
             odt['First Index'] = [0] * len(dvals)
             odt['Interval'] = [1] * len(dvals)
             odt['Last Index'] = dmax
+            if len(dvals) > 1:
+                odt['Reduction'] = ['None'] * len(dvals)
+                self.select_table.columns = self.select_cols
+            else:  # Nothing to reduce a dimension variable over
+                self.select_table.columns = self.select_cols[:-1]
             self.ds_select.data = odt
 
             self.p_sel.text = 'Variable: ' + self.var_name
 
             self.get_pltops_btn.disabled = False
-            self.get_data_btn.disabled = True  # Disable to avoid mismatch
+            self.get_data_ok = False  # Disable to avoid mismatch
+            self.update_buttons()
 
             self.stat_box.text = '<font color="green">Variable selected.</font>'
 
@@ -388,7 +624,7 @@ class App:
             elif nav == 3:
                 opts, opt_dims = self.get_opts_3d(num_dims, av_dims)
             else:
-                opts = [('None (maximum 3 dimensions - please reduce others to singletons)')]
+                opts = [('None (maximum 3 dimensions - please reduce others to singletons or set reductions)')]
                 opt_dims = []
 
         self.plot_ops.options = opts
@@ -396,7 +632,8 @@ class App:
         self.opt_dims = opt_dims
 
         if nav > 0:
-            self.get_data_btn.disabled = False
+            self.get_data_ok = True
+            self.update_buttons()
 
         self.stat_box.text = '<font color="green">Plot options found.</font>'
 
@@ -406,12 +643,11 @@ class App:
         Get the plot options for the 1D case
         """
 
-        sel = self.ds_dds.selected.indices[0]
-
         opts = []
         opt_dims = []
 
-        if self.ds_dds.data['Dimensions'][sel][0] > 1:
+        # Use the DDS rather than the table as the page shown may have changed
+        if self.odh.dds[self.var_name][1][0] > 1:
             opts.append(self.var_name + ' against index (line plot)')
             opt_dims.append([0])
             nav = 1
@@ -468,25 +704,60 @@ class App:
     def get_av_dims(self):
 
         """
-        Get available (non-singleton) dimensions
+        Get available (non-singleton and not reduced) dimensions
         """
 
         num_dims = len(self.ds_select.data['Dimension'])
+        red_dims = [dim for dim, _ in self.get_red_dims()]
 
         av_dims = [False] * num_dims
         nav = 0
         for dim in range(num_dims):
-            rmin = self.ds_select.data['First Index'][dim]
-            rint = self.ds_select.data['Interval'][dim]
-            rmax = self.ds_select.data['Last Index'][dim] + 1
-            if rmax > rmin:
-                tli = list(range(rmin, rmax, rint))
-                if len(tli) > 1:
-                    av_dims[dim] = True
-                    nav += 1
+            if (self.get_dim_len(dim) > 1) and (dim not in red_dims):
+                av_dims[dim] = True
+                nav += 1
 
         return nav, av_dims
 
+    def get_red_dims(self):
+
+        """
+        Get the (non-singleton) dimensions to be reduced and their reductions
+        """
+
+        red_dims = []
+        if 'Reduction' in self.ds_select.data:
+            for dim, red in enumerate(self.ds_select.data['Reduction']):
+                if (red in StreamReducer.ops) and (self.get_dim_len(dim) > 1):
+                    red_dims.append((dim, red))
+
+        return red_dims
+
+    def get_data_label(self):
+
+        """
+        Get the label for the plotted data, including any reductions
+        """
+
+        if len(self.red_dims) == 0:
+            return self.var_name
+
+        reds = [op + ' over ' + self.ds_select.data['Dimension'][dim] for dim, op in self.red_dims]
+
+        return self.var_name + ' (' + ', '.join(reds) + ')'
+
+    def get_dim_len(self, dim):
+
+        """
+        Get the number of selected values in a dimension
+        """
+
+        rmin = self.ds_select.data['First Index'][dim]
+        rint = self.ds_select.data['Interval'][dim]
+        rmax = self.ds_select.data['Last Index'][dim] + 1
+
+        return len(range(rmin, rmax, rint)) if rint > 0 else 0
+
     def get_data(self):
 
         """
@@ -495,74 +766,302 @@ class App:
 
         self.stat_box.text = '<font color="blue">Getting data...</font>'
 
+        self.stop_playback()
+        self.close_volume()
+
         self.data = {}  # Clear the data dictionary
         self.dim_names = []  # Clear the dimension names list
+        self.attrs_pending = False
 
         if len(self.endian_chkbox.active) > 0:
             byte_ord_str = '>'
         else:
             byte_ord_str = '<'
+        self.byte_ord_str = byte_ord_str
 
-        ndims = len(self.odh.dds[self.var_name][2])
+        ind = self.plot_ops.options.index(self.plot_ops.value)
+        self.plot_dims = self.opt_dims[ind]
 
-        if ndims == 1:  # Dimension variable
+        if type(self.plot_dims) is int:
+            self.plot_dims = [self.plot_dims]
 
-            dim_vals = numpy.ndarray(shape=(1, 3), dtype=numpy.dtype('int'))
-            dim_vals[0, 0] = self.ds_select.data['First Index'][0]
-            dim_vals[0, 1] = self.ds_select.data['Interval'][0]
-            dim_vals[0, 2] = self.ds_select.data['Last Index'][0]
-            self.odh.get_variable(self.var_name, dim_vals, byte_ord_str)
-            self.data[self.var_name] = numpy.ndarray(shape=self.odh.variables[self.var_name].shape,
-                                                     dtype=numpy.dtype('float32'))
-            self.data[self.var_name][:] = self.odh.variables[self.var_name][:]
-            self.apply_attributes(self.var_name)  # Apply any attributes
-            self.dim_names.append(self.var_name)
+        self.red_dims = self.get_red_dims()
 
-        else:  # Data variable
+        # Slices are fetched during playback instead if streaming
+        self.play_stream = (len(self.plot_dims) == 3) and (len(self.stream_chkbox.active) > 0)
 
-            dim_vals = numpy.ndarray(shape=(ndims, 3),
-                                     dtype=numpy.dtype('int'))
+        # Otherwise the volume may be held on disk
+        use_volume = (len(self.plot_dims) == 3) and (not self.play_stream) and \
+            (len(self.mapped_chkbox.active) > 0)
 
-            for dim in range(ndims):
-                dim_vals[dim, 0] = self.ds_select.data['First Index'][dim]
-                dim_vals[dim, 1] = self.ds_select.data['Interval'][dim]
-                dim_vals[dim, 2] = self.ds_select.data['Last Index'][dim]
+        # Statistics for colour limits, per slice along the slider dimension
+        self.stats = {}
+        self.stats_axis = self.plot_dims[0] if len(self.plot_dims) == 3 else None
+        if len(self.plot_dims) > 1:
+            num_slices = 1 if self.stats_axis is None else self.get_dim_len(self.stats_axis)
+            self.stats[self.var_name] = IngestStats(num_slices)
+
+        # Wait for any slice still being fetched by a stopped prefetcher
+        with self.fetch_lock:
+
+            ndims = len(self.odh.dds[self.var_name][2])
+
+            if ndims == 1:  # Dimension variable
+
+                dim_vals = numpy.ndarray(shape=(1, 3), dtype=numpy.dtype('int'))
+                dim_vals[0, 0] = self.ds_select.data['First Index'][0]
+                dim_vals[0, 1] = self.ds_select.data['Interval'][0]
+                dim_vals[0, 2] = self.ds_select.data['Last Index'][0]
+                self.odh.get_variable(self.var_name, dim_vals, byte_ord_str)
+                self.data[self.var_name] = numpy.ndarray(shape=self.odh.variables[self.var_name].shape,
+                                                         dtype=numpy.dtype('float32'))
+                self.data[self.var_name][:] = self.odh.variables[self.var_name][:]
+                self.apply_attributes(self.var_name)  # Apply any attributes
+                self.dim_names.append(self.var_name)
+
+            else:  # Data variable
+
+                dim_vals = numpy.ndarray(shape=(ndims, 3),
+                                         dtype=numpy.dtype('int'))
+
+                for dim in range(ndims):
+                    dim_vals[dim, 0] = self.ds_select.data['First Index'][dim]
+                    dim_vals[dim, 1] = self.ds_select.data['Interval'][dim]
+                    dim_vals[dim, 2] = self.ds_select.data['Last Index'][dim]
+
+                # Get the variable
+
+                if self.play_stream:
+                    self.play_dim_vals = dim_vals
+                elif use_volume:
+                    self.volume = self.fetch_volume(dim_vals, byte_ord_str)
+                else:
+                    # Attributes are applied to the full variable in the compute pool
+                    self.attrs_pending = len(self.red_dims) == 0
+                    self.data[self.var_name] = self.fetch_variable(dim_vals, byte_ord_str,
+                                                                   shared=self.attrs_pending,
+                                                                   stats=self.stats.get(self.var_name))
+
+                # Get the map variables over the ranges required
+
+                dim_data = numpy.ndarray(shape=(1, 3), dtype=numpy.dtype('int'))
+                for dim in range(ndims):
+                    dim_data[:] = dim_vals[dim]
+                    dim_name = self.odh.dds[self.var_name][2][dim]
+                    self.odh.get_variable(dim_name, dim_data, byte_ord_str)
+                    self.data[dim_name] = numpy.ndarray(shape=self.odh.variables[dim_name].shape,
+                                                        dtype=float32)
+                    self.data[dim_name][:] = self.odh.variables[dim_name][:]
+                    self.apply_attributes(dim_name)  # Apply any attributes
+                    self.dim_names.append(dim_name)
 
-            # Get the variable
+        self.stat_box.text = '<font color="green">Data downloaded.</font>'
 
-            self.odh.get_variable(self.var_name, dim_vals, byte_ord_str)
-            self.data[self.var_name] = numpy.ndarray(shape=self.odh.variables[self.var_name].shape,
-                                                     dtype=float32)
-            self.data[self.var_name][:] = self.odh.variables[self.var_name][:]
-            self.apply_attributes(self.var_name)  # Apply any attributes
+        # The lock flag must be set on the partial itself: it is not passed on
+        self.doc.add_next_tick_callback(without_document_lock(partial(self.process_data, self.start_job())))
 
-            # Get the map variables over the ranges required
+    async def process_data(self, job_id):
 
-            dim_data = numpy.ndarray(shape=(1, 3), dtype=numpy.dtype('int'))
-            for dim in range(ndims):
-                dim_data[:] = dim_vals[dim]
-                dim_name = self.odh.dds[self.var_name][2][dim]
-                self.odh.get_variable(dim_name, dim_data, byte_ord_str)
-                self.data[dim_name] = numpy.ndarray(shape=self.odh.variables[dim_name].shape,
-                                                    dtype=float32)
-                self.data[dim_name][:] = self.odh.variables[dim_name][:]
-                self.apply_attributes(dim_name)  # Apply any attributes
-                self.dim_names.append(dim_name)
+        """
+        Apply any attributes to the downloaded variable in the compute pool,
+        then display it (scheduled without the document lock)
+        """
 
-        ind = self.plot_ops.options.index(self.plot_ops.value)
-        self.plot_dims = self.opt_dims[ind]
+        stats = None
+        if self.attrs_pending:
+            try:
+                stats = await self.pool.apply_attributes(self.data[self.var_name],
+                                                         self.get_attributes(self.var_name),
+                                                         axis=self.stats_axis)
+            except Exception:
+                self.doc.add_next_tick_callback(partial(self.end_job, job_id,
+                                                        '<font color="red">Error: could not apply attributes</font>'))
+                return
 
-        if type(self.plot_dims) is int:
-            self.plot_dims = [self.plot_dims]
+        self.doc.add_next_tick_callback(partial(self.finish_processing, job_id, stats))
 
-        self.stat_box.text = '<font color="green">Data downloaded.</font>'
+    def finish_processing(self, job_id, stats):
+
+        """
+        Store the statistics gathered while applying the attributes and
+        display the data, unless newer data have been requested since
+        """
+
+        if job_id != self.job_id:
+            return
+
+        if stats is not None:
+            self.stats[self.var_name] = stats
+        self.attrs_pending = False
 
         self.display_data()
 
-    def apply_attributes(self, var_name):
+    def start_job(self):
+
+        """
+        Start a job (downloading, processing or displaying data), disabling
+        the buttons that would start another, and get its id
+        """
+
+        self.job_id += 1
+        self.job_running = True
+        self.update_buttons()
+
+        return self.job_id
+
+    def end_job(self, job_id, text=None):
+
+        """
+        End a job, showing any status text, unless it has been superseded
+        """
+
+        if job_id != self.job_id:
+            return
+
+        self.job_running = False
+        self.update_buttons()
+        if text is not None:
+            self.stat_box.text = text
+
+    def update_buttons(self):
+
+        """
+        Enable the Get data and Update Display buttons when they can be used
+        """
+
+        self.get_data_btn.disabled = self.job_running or not self.get_data_ok
+        self.update_btn.disabled = self.job_running
+
+    def fetch_variable(self, dim_vals, byte_ord_str, shared=False, stats=None, first_slice=0):
+
+        """
+        Download the selected variable with any attributes applied and any
+        reductions carried out. If shared (and not reducing), the variable is
+        put in shared memory without applying the attributes. If stats are
+        given, the statistics of the slices downloaded (starting at slice
+        index first_slice) are added to them.
+        """
+
+        if len(self.red_dims) > 0:
+            data = self.get_reduced_variable(dim_vals, self.red_dims, byte_ord_str)
+            if stats is not None:
+                stats.add_slices(data, self.stats_axis, first_slice)
+            return data
+
+        self.odh.get_variable(self.var_name, dim_vals, byte_ord_str)
+        if shared:
+            data = SharedArray.create(self.odh.variables[self.var_name].shape, dtype=float32)
+        else:
+            data = numpy.ndarray(shape=self.odh.variables[self.var_name].shape, dtype=float32)
+        data[:] = self.odh.variables.pop(self.var_name)[:]
+        if not shared:
+            self.apply_attributes(self.var_name, data, stats, first_slice)  # Apply any attributes
+
+        return data
+
+    def fetch_volume(self, dim_vals, byte_ord_str):
+
+        """
+        Download the selected variable into an out-of-core volume in chunks
+        of slices along the slider dimension, so that only one chunk is held
+        in memory at a time
+        """
+
+        zdim = self.plot_dims[0]
+        z_inds = range(dim_vals[zdim, 0], dim_vals[zdim, 2] + 1, dim_vals[zdim, 1])
+
+        shape = [len(range(dim_vals[dim, 0], dim_vals[dim, 2] + 1, dim_vals[dim, 1]))
+                 for dim in range(dim_vals.shape[0])]
+        for dim, _ in self.red_dims:
+            shape[dim] = 1
+        chunk_len = max(1, self.mapped_chunk_size * shape[zdim] // int(numpy.prod(shape)))
+
+        volume = MappedVolume(MappedVolume.get_shape(shape, zdim), self.mapped_dir)
+        chunk_vals = dim_vals.copy()
+
+        for start in range(0, len(z_inds), chunk_len):
+
+            c_inds = z_inds[start:start + chunk_len]
+            chunk_vals[zdim, 0] = c_inds[0]
+            chunk_vals[zdim, 2] = c_inds[-1]
+
+            chunk = self.fetch_variable(chunk_vals, byte_ord_str,
+                                        stats=self.stats.get(self.var_name), first_slice=start)
+            volume.put_slices(start, chunk, zdim)
+            del chunk
+
+        return volume
+
+    def close_volume(self):
+
+        """
+        Release any out-of-core volume
+        """
+
+        # Not closed explicitly as a stopped prefetcher may still be reading
+        # it: the mapping is released when the last reference goes
+        self.volume = None
+
+    def get_reduced_variable(self, dim_vals, red_dims, byte_ord_str):
+
+        """
+        Get the variable with the reduced dimensions collapsed to singletons.
+        Chunks are downloaded along the first reduced dimension; any other
+        reduced dimensions are collapsed within each chunk before it is added
+        to the accumulator.
+        """
+
+        s_dim, s_op = red_dims[0]
+        s_inds = range(dim_vals[s_dim, 0], dim_vals[s_dim, 2] + 1, dim_vals[s_dim, 1])
+
+        # Number of slices along the streamed dimension per chunk
+
+        slice_size = 1
+        for dim in range(dim_vals.shape[0]):
+            if dim != s_dim:
+                slice_size *= len(range(dim_vals[dim, 0], dim_vals[dim, 2] + 1, dim_vals[dim, 1]))
+        chunk_len = max(1, self.reduction_chunk_size // slice_size)
+
+        reducer = StreamReducer(s_op, s_dim)
+        chunk_vals = dim_vals.copy()
+
+        for start in range(0, len(s_inds), chunk_len):
+
+            c_inds = s_inds[start:start + chunk_len]
+            chunk_vals[s_dim, 0] = c_inds[0]
+            chunk_vals[s_dim, 2] = c_inds[-1]
+
+            self.odh.get_variable(self.var_name, chunk_vals, byte_ord_str)
+            chunk = numpy.ndarray(shape=self.odh.variables[self.var_name].shape, dtype=float32)
+            chunk[:] = self.odh.variables.pop(self.var_name)[:]
+            self.apply_attributes(self.var_name, chunk)  # Apply any attributes
+
+            for dim, op in reversed(red_dims[1:]):
+                chunk = StreamReducer.reduce(chunk, op, dim)
+
+            reducer.update(chunk)
+            del chunk
+
+        return reducer.result()
+
+    def apply_attributes(self, var_name, data=None, stats=None, first_slice=0):
 
         """
-        Apply the attributes
+        Apply the attributes (to the stored variable data unless an array
+        is given), gathering the statistics of the slices in the same pass
+        if stats are given
+        """
+
+        if data is None:
+            data = self.data[var_name]
+        apply_attr_values(data, *self.get_attributes(var_name),
+                          stats=stats, axis=self.stats_axis, first=first_slice)
+
+    def get_attributes(self, var_name):
+
+        """
+        Get the scale factor, offset, fill value and missing value (NaN for
+        any not present)
         """
 
         attr_list = self.odh.das[var_name]
@@ -583,24 +1082,21 @@ class App:
             if attr_name in self.attr_names['MissingValueName']:
                 missing_value = float(attr_val)
 
-        data = self.data[var_name]
-        if not numpy.isnan(fill_value):
-            data[data == fill_value] = numpy.nan
-        if not numpy.isnan(missing_value):
-            data[data == missing_value] = numpy.nan
-        if not numpy.isnan(scale_factor):
-            data *= scale_factor
-        if not numpy.isnan(offset):
-            data += offset
+        return scale_factor, offset, fill_value, missing_value
 
     def display_data(self):
 
         """
-        Display the data
+        Display the data. Except when streaming slices or reading them from
+        an out-of-core volume, the data are transposed and interpolated in
+        the compute pool and the plot is made when that has finished.
         """
 
         self.stat_box.text = '<font color="blue">Displaying data...</font>'
 
+        job_id = self.start_job()
+        self.stop_playback()
+
         xname = yname = zname = None
         if len(self.plot_dims) == 2:
             xname = self.ds_select.data['Dimension'][self.plot_dims[1]]
@@ -618,12 +1114,109 @@ class App:
         if len(self.revz_chkbox.active) > 0:
             revz = True
 
-        x_t = y_t = data_t = None
-        if len(self.plot_dims) > 1:
-            x_t, y_t, data_t = self.get_trans_data(xname, yname, revx, revy)
+        if len(self.plot_dims) == 1:
+            try:
+                self.show_display(self.display_line_plot(revx, revy))
+            except Exception:
+                self.end_job(job_id, '<font color="red">Error: could not display data</font>')
+                return
+            self.end_job(job_id)
+            return
+
+        try:  # Get non-uniformity tolerance if specified
+            nu_tol = float(self.interp_tol_box.value)
+        except ValueError:
+            nu_tol = 0
+
+        try:  # Get interpolation interval if specified
+            ax_int = float(self.interp_int_box.value)
+        except ValueError:
+            ax_int = None
+
+        if self.play_stream or (self.volume is not None):
+            try:
+                from bokcolmaps.interp_data import interp_data  # Imported on first plot
+                self.play_trans = [xname, yname, revx, revy]
+                data = self.get_source_slice(0)
+                x_t, y_t, data_t = self.get_trans_slice(data, xname, yname, revx, revy)
+                x_t, y_t, data_t, ax_int, msg = interp_data(x_t, y_t, data_t, nu_tol=nu_tol, ax_int=ax_int)
+                self.play_interp = [nu_tol, ax_int]  # Applied to each streamed slice
+                self.plot_data(x_t, y_t, data_t, ax_int, msg, xname, yname, zname, revz)
+            except Exception:
+                self.stop_playback()  # In case the prefetcher was started
+                self.end_job(job_id, '<font color="red">Error: could not display data</font>')
+                return
+            self.end_job(job_id)
+        else:
+            self.doc.add_next_tick_callback(without_document_lock(partial(self.transform_data, job_id,
+                                                                          xname, yname, zname, revx, revy,
+                                                                          revz, nu_tol, ax_int)))
+
+    async def transform_data(self, job_id, xname, yname, zname, revx, revy, revz, nu_tol, ax_int):
+
+        """
+        Transpose and interpolate the data in the compute pool, then plot it
+        (scheduled without the document lock)
+        """
+
+        try:
+            x_t, y_t, data_t = await self.get_trans_data(xname, yname, revx, revy)
+            x_t, y_t, data_t, ax_int, msg = await self.pool.interp_data(x_t, y_t, data_t,
+                                                                        nu_tol=nu_tol, ax_int=ax_int)
+        except Exception:
+            self.doc.add_next_tick_callback(partial(self.end_job, job_id,
+                                                    '<font color="red">Error: could not transform data</font>'))
+            return
+
+        self.doc.add_next_tick_callback(partial(self.finish_transform, job_id, x_t, y_t, data_t, ax_int, msg,
+                                                xname, yname, zname, revz))
+
+    def finish_transform(self, job_id, *args):
+
+        """
+        Plot the transformed data unless a newer display has been requested
+        since (the arguments are those of plot_data)
+        """
+
+        if job_id != self.job_id:
+            return
+
+        try:
+            self.plot_data(*args)
+        except Exception:
+            self.end_job(job_id, '<font color="red">Error: could not display data</font>')
+            return
+        self.end_job(job_id)
+
+    def plot_data(self, x_t, y_t, data_t, ax_int, msg, xname, yname, zname, revz):
+
+        """
+        Plot transposed and interpolated 2D or 3D data
+        """
+
+        if msg is not None:
+            self.stat_box.text = msg
+
+        if ax_int is not None:
+            self.interp_int_box.value = str(ax_int)
+
+        if data_t is None:
+            return
 
         rmin_v, rmax_v = self.get_cmap_lims()
 
+        # Automatic limits from the ingest statistics unless fixed. When
+        # streaming these only cover the slices fetched so far, so unless
+        # they are per slice they are widened as more slices arrive.
+        slice_lims = False
+        self.play_widen_lims = False
+        if (rmax_v is None) and (self.var_name in self.stats):
+            rmin_v, rmax_v = self.get_auto_lims()
+            slice_lims = (len(self.plot_dims) == 3) and (len(self.slice_lims_chkbox.active) > 0)
+            self.play_widen_lims = self.play_stream and not slice_lims
+            self.play_lims_count = self.stats[self.var_name].num_gathered()
+        self.play_slice_lims = slice_lims
+
         if self.col_map_path is not None:
             cfile = self.col_map_path
             if not os.path.exists(cfile):
@@ -632,61 +1225,533 @@ class App:
         else:
             cfile = None
 
-        try:  # Get non-uniformity tolerance if specified
-            nu_tol = float(self.interp_tol_box.value)
-        except ValueError:
-            nu_tol = 0
+        # Plotting modules are imported on first plot to keep session start-up fast
 
-        disp = None
+        if len(self.plot_dims) == 2:
 
-        if len(self.plot_dims) == 1:
+            from bokcolmaps.CMSlicer2D import CMSlicer2D
+            disp = CMSlicer2D(x_t, y_t, numpy.array([0]), data_t,
+                              xlab=xname, ylab=yname, zlab=zname, dmlab=self.get_data_label(),
+                              cfile=cfile, cmheight=self.main_plot_size[0], cmwidth=self.main_plot_size[1],
+                              spheight=self.slice_plot_size[0], spwidth=self.slice_plot_size[1],
+                              rmin=rmin_v, rmax=rmax_v)
+
+        elif self.play_stream or (self.volume is not None):
 
-            disp = self.display_line_plot(revx, revy)
+            disp = self.display_stream(x_t, y_t, data_t, xname, yname, zname,
+                                       cfile, rmin_v, rmax_v, revz)
 
         else:
 
-            try:  # Get interpolation interval if specified
-                ax_int = float(self.interp_int_box.value)
-            except ValueError:
-                ax_int = None
+            from bokcolmaps.CMSlicer3D import CMSlicer3D
+            disp = CMSlicer3D(x_t, y_t, self.data[zname], data_t,
+                              xlab=xname, ylab=yname, zlab=zname, dmlab=self.get_data_label(),
+                              cfile=cfile, cmheight=self.main_plot_size[0], cmwidth=self.main_plot_size[1],
+                              spheight=self.slice_plot_size[0], spwidth=self.slice_plot_size[1],
+                              lpheight=self.line_plot_size[0], lpwidth=self.line_plot_size[1],
+                              padabove=self.main_plot_size[0] // 10, padleft=self.main_plot_size[1] // 10,
+                              rmin=rmin_v, rmax=rmax_v, revz=revz, hoverdisp=self.hoverdisp3d)
+            self.play_slider = disp.cmap.zslider
+
+            if slice_lims:
+                self.set_slice_lims(disp.cmap.cmaplp.cmplot)
+
+        self.show_display(disp)
+
+    def get_auto_lims(self, ind=None):
+
+        """
+        Get automatic colour map limits for a slice, or over all the slices
+        gathered so far (all the data unless streaming), from the ingest
+        statistics
+        """
+
+        lower, upper = self.lims_pcts[self.auto_lims.value]
+        rmin_v, rmax_v = self.stats[self.var_name].get_lims(lower, upper, ind)
+
+        if numpy.isnan(rmin_v) or numpy.isnan(rmax_v):  # No finite values
+            rmin_v = rmax_v = 0
+        if rmax_v == rmin_v:
+            rmax_v += 0.1
+
+        return float(rmin_v), float(rmax_v)
+
+    def widen_lims(self):
+
+        """
+        Widen the colour map limits of a streamed volume to cover any slices
+        fetched since they were last set
+        """
+
+        num_gathered = self.stats[self.var_name].num_gathered()
+        if num_gathered == self.play_lims_count:
+            return
+        self.play_lims_count = num_gathered
+
+        rmin_v, rmax_v = self.get_auto_lims()
+        cmap = self.play_cmap.cmap
+        cmap.low, cmap.high = min(cmap.low, rmin_v), max(cmap.high, rmax_v)
+
+    def set_slice_lims(self, cmplot):
+
+        """
+        Set the colour map limits for each slice of a colour map with a
+        slider
+        """
+
+        lims = [self.get_auto_lims(ind) for ind in range(self.stats[self.var_name].num_slices)]
+        cmplot.mmsrc.data = {'minvals': [lim[0] for lim in lims],
+                             'maxvals': [lim[1] for lim in lims]}
+        cmplot.cmap.low, cmplot.cmap.high = lims[0]
+
+    def show_display(self, disp):
+
+        """
+        Put a plot in the Data Visualisation tab
+        """
 
-            x_t, y_t, data_t, ax_int, msg = interp_data(x_t, y_t, data_t, nu_tol=nu_tol, ax_int=ax_int)
+        self.tabs.tabs[1].child.children[0] = disp
+        self.tabs.active = 1
+        self.play_btn.disabled = self.play_slider is None
+        self.stat_box.text = '<font color="green">Finished.</font>'
 
-            if msg is not None:
-                self.stat_box.text = msg
+    def display_stream(self, x_t, y_t, data_t, xname, yname, zname, cfile, rmin_v, rmax_v, revz):
 
-            if ax_int is not None:
-                self.interp_int_box.value = str(ax_int)
+        """
+        Display the first slice of a streamed or out-of-core volume with a
+        slider, and start fetching the following slices in the background
+        """
 
-            if data_t is not None:
+        from bokcolmaps.ColourMap import ColourMap  # Imported on first plot
 
-                if len(self.plot_dims) == 2:
+        num_slices = self.data[zname].size
 
-                    disp = CMSlicer2D(x_t, y_t, numpy.array([0]), data_t,
-                                      xlab=xname, ylab=yname, zlab=zname, dmlab=self.var_name,
-                                      cfile=cfile, cmheight=self.main_plot_size[0], cmwidth=self.main_plot_size[1],
-                                      spheight=self.slice_plot_size[0], spwidth=self.slice_plot_size[1],
-                                      rmin=rmin_v, rmax=rmax_v)
+        self.play_zname = zname
+        self.play_cmap = ColourMap(x_t, y_t, numpy.array([self.data[zname][0]]), data_t,
+                                   xlab=xname, ylab=yname, zlab=zname, dmlab=self.get_data_label(),
+                                   cfile=cfile, height=self.main_plot_size[0], width=self.main_plot_size[1],
+                                   rmin=rmin_v, rmax=rmax_v, hover=self.hoverdisp3d)
 
-                elif len(self.plot_dims) == 3:
+        self.play_slider = Slider(title=zname + ' index', start=0, end=num_slices - 1,
+                                  step=1, value=0, width=self.main_plot_size[1])
+        self.play_slider.on_change('value', self.seek_playback)
 
-                    disp = CMSlicer3D(x_t, y_t, self.data[zname], data_t,
-                                      xlab=xname, ylab=yname, zlab=zname, dmlab=self.var_name,
-                                      cfile=cfile, cmheight=self.main_plot_size[0], cmwidth=self.main_plot_size[1],
-                                      spheight=self.slice_plot_size[0], spwidth=self.slice_plot_size[1],
-                                      lpheight=self.line_plot_size[0], lpwidth=self.line_plot_size[1],
-                                      padabove=self.main_plot_size[0] // 10, padleft=self.main_plot_size[1] // 10,
-                                      rmin=rmin_v, rmax=rmax_v, revz=revz, hoverdisp=self.hoverdisp3d)
+        self.prefetcher = SlicePrefetcher(partial(self.get_playback_slice, self.job_id), num_slices,
+                                          depth=self.prefetch_depth, on_fetch=self.slice_fetched)
+        self.prefetcher.put(0, data_t)
+        self.prefetcher.start()
 
-        if (len(self.plot_dims) == 1) or (data_t is not None):
-            self.tabs.tabs[1].child.children[0] = disp
-            self.tabs.active = 1
-            self.stat_box.text = '<font color="green">Finished.</font>'
+        self.show_frame(0, data_t)
 
-    def get_trans_data(self, xname, yname, revx, revy):
+        if self.volume is not None:
+            self.play_section = [cfile, rmin_v, rmax_v, revz]
+            self.play_row = Row(self.play_cmap, self.get_volume_line_plot(zname, revz))
+            self.play_row.children.append(self.get_volume_section())
+            return Column(self.play_slider, self.play_row)
+
+        return Column(self.play_slider, self.play_cmap)
+
+    def get_volume_line_plot(self, zname, revz):
 
         """
-        Get the transposed data and axes
+        Get a line plot through the slices of an out-of-core volume, shown
+        for the point clicked on the colour map. Pairs of clicks also set the
+        ends of a track for a section through the slices.
+        """
+
+        from bokeh.plotting import figure  # Imported on first plot
+        from bokeh.events import Tap
+        from bokeh.models.glyphs import Line
+
+        z = self.data[zname]
+
+        disp = figure(x_axis_label=self.get_data_label(), y_axis_label=zname,
+                      height=self.line_plot_size[0], width=self.line_plot_size[1],
+                      tools=["reset,pan,wheel_zoom,box_zoom,save"])
+
+        self.play_line = ColumnDataSource(data={'x': [], 'y': []})
+        disp.line(x='x', y='y', source=self.play_line, line_color='blue', line_width=2, line_alpha=1)
+
+        disp.toolbar_location = 'above'
+        disp.title.text = 'Click on the plot'
+
+        disp.title.text_font = disp.xaxis.axis_label_text_font = \
+            disp.yaxis.axis_label_text_font = 'garamond'
+        disp.xaxis.axis_label_text_font_size = \
+            disp.yaxis.axis_label_text_font_size = '10pt'
+        disp.title.text_font_style = \
+            disp.xaxis.axis_label_text_font_style = \
+            disp.yaxis.axis_label_text_font_style = 'bold'
+        disp.title.text_font_size = '8pt'
+        if revz:
+            disp.y_range.start, disp.y_range.end = z[-1], z[0]
+        else:
+            disp.y_range.start, disp.y_range.end = z[0], z[-1]
+
+        self.play_line_plot = disp
+
+        # Section track, initially across the middle of the plot as for CMSlicer3D
+        x, y = self.data[self.play_trans[0]], self.data[self.play_trans[1]]
+        y_mid = (y[0] + y[-1]) / 2
+        self.play_track = ColumnDataSource(data={'x': [x[0], x[-1]], 'y': [y_mid, y_mid]})
+        self.play_track_start = None
+        self.play_cmap.plot.add_glyph(self.play_track, Line(x='x', y='y', line_color='white', line_width=5,
+                                                            line_dash='dashed', line_alpha=1))
+
+        self.play_cmap.plot.on_event(Tap, self.volume_tapped)
+
+        return disp
+
+    def volume_tapped(self, event):
+
+        """
+        Show the line through the slices of an out-of-core volume nearest to
+        the point clicked, and start or finish the section track
+        """
+
+        if self.volume is None:
+            return
+
+        self.show_volume_line(event.x, event.y)
+
+        if self.play_track_start is None:
+            self.play_track_start = (event.x, event.y)
+        else:
+            (x_0, y_0), self.play_track_start = self.play_track_start, None
+            self.play_track.data = {'x': [x_0, event.x], 'y': [y_0, event.y]}
+            self.play_row.children[2] = self.get_volume_section()
+
+    def show_volume_line(self, x_c, y_c):
+
+        """
+        Show the line through the slices of an out-of-core volume nearest to
+        a point (only the values on the line are read from disk)
+        """
+
+        xname, yname = self.play_trans[:2]
+        ix = int(numpy.nanargmin(numpy.abs(self.data[xname] - x_c)))
+        iy = int(numpy.nanargmin(numpy.abs(self.data[yname] - y_c)))
+
+        if self.plot_dims[1] > self.plot_dims[2]:  # x dimension first
+            line = self.volume.get_line((ix, iy))
+        else:
+            line = self.volume.get_line((iy, ix))
+
+        self.play_line.data = {'x': line, 'y': self.data[self.play_zname]}
+        self.play_line_plot.title.text = xname + ' = ' + str(self.data[xname][ix]) + ', ' + \
+            yname + ' = ' + str(self.data[yname][iy])
+
+    def get_volume_section(self):
+
+        """
+        Get a colour map of the section through the slices of an out-of-core
+        volume along the track, interpolated bilinearly at points spaced as
+        for CMSlicer3D
+        """
+
+        from bokcolmaps.ColourMap import ColourMap  # Imported on first plot
+
+        xname, yname = self.play_trans[:2]
+        x, y = self.data[xname], self.data[yname]
+        z = self.data[self.play_zname]
+        cfile, rmin_v, rmax_v, revz = self.play_section
+
+        x_0, x_1 = self.play_track.data['x']
+        y_0, y_1 = self.play_track.data['y']
+
+        num_x = int(numpy.floor(numpy.abs(x_1 - x_0) / numpy.min(numpy.abs(numpy.diff(x))))) + 1 \
+            if x.size > 1 else 1
+        num_y = int(numpy.floor(numpy.abs(y_1 - y_0) / numpy.min(numpy.abs(numpy.diff(y))))) + 1 \
+            if y.size > 1 else 1
+        num_c = max(num_x, num_y, 2)
+
+        x_i = numpy.linspace(x_0, x_1, num_c)
+        y_i = numpy.linspace(y_0, y_1, num_c)
+        r_i = numpy.sqrt((x_i - x_i[0]) ** 2 + (y_i - y_i[0]) ** 2)
+
+        if self.plot_dims[1] > self.plot_dims[2]:  # x dimension first
+            dm_i = self.volume.get_section(x, y, x_i, y_i)
+        else:
+            dm_i = self.volume.get_section(y, x, y_i, x_i)
+
+        z_i = z
+        if revz:
+            z_i = numpy.flipud(z_i)
+            dm_i = numpy.flipud(dm_i)
+
+        return ColourMap(r_i, z_i, [0], dm_i, cfile=cfile,
+                         xlab='Distance', ylab=self.play_zname,
+                         dmlab=self.get_data_label() + ' along track',
+                         height=self.slice_plot_size[0], width=self.slice_plot_size[1],
+                         rmin=rmin_v, rmax=rmax_v, hover=self.hoverdisp3d)
+
+    def get_slice_dim_vals(self, ind):
+
+        """
+        Get the dimension selections for a single slice along the slider
+        dimension
+        """
+
+        dim_vals = self.play_dim_vals.copy()
+        zdim = self.plot_dims[0]
+        dim_vals[zdim, 0] = dim_vals[zdim, 2] = dim_vals[zdim, 0] + ind * dim_vals[zdim, 1]
+
+        return dim_vals
+
+    def get_source_slice(self, ind, job_id=None):
+
+        """
+        Get a single slice, read from the out-of-core volume if there is one
+        and otherwise downloaded. If a job id is given and the display has
+        been replaced since, nothing is read.
+        """
+
+        volume = self.volume
+        if volume is not None:
+            return volume.get_slice(ind)
+
+        with self.fetch_lock:
+            if (job_id is not None) and (job_id != self.job_id):
+                raise RuntimeError('Slice requested for a replaced display')
+            return self.fetch_variable(self.get_slice_dim_vals(ind), self.byte_ord_str,
+                                       stats=self.stats[self.var_name], first_slice=ind)
+
+    def get_playback_slice(self, job_id, ind):
+
+        """
+        Get a single slice and transform it for display (called from the
+        prefetcher thread)
+        """
+
+        data = self.get_source_slice(ind, job_id)
+
+        from bokcolmaps.interp_data import interp_data  # Imported on first plot
+
+        x_t, y_t, data_t = self.get_trans_slice(data, *self.play_trans)
+        data_t = interp_data(x_t, y_t, data_t, nu_tol=self.play_interp[0], ax_int=self.play_interp[1])[2]
+
+        return data_t
+
+    def get_trans_slice(self, data, xname, yname, revx, revy):
+
+        """
+        Get a single transposed slice and the axes
+        """
+
+        data_t = numpy.squeeze(data)
+        if self.plot_dims[1] > self.plot_dims[2]:  # x dimension first
+            data_t = data_t.transpose()
+
+        x_t = self.data[xname].copy()
+        y_t = self.data[yname].copy()
+        if revx:
+            x_t = numpy.flipud(x_t)
+            data_t = numpy.fliplr(data_t)
+        if revy:
+            y_t = numpy.flipud(y_t)
+            data_t = numpy.flipud(data_t)
+
+        return x_t, y_t, data_t
+
+    def show_frame(self, ind, frame):
+
+        """
+        Send a streamed slice to the browser
+        """
+
+        self.play_cmap.datasrc.patch({'image': [(0, frame)]})
+        if self.play_slice_lims:
+            self.play_cmap.cmap.low, self.play_cmap.cmap.high = self.get_auto_lims(ind)
+        elif self.play_widen_lims:
+            self.widen_lims()
+        elif self.play_cmap.get_autoscale():
+            self.play_cmap.update_cbar()
+
+        self.play_cmap.plot.title.text = self.get_data_label() + ', ' + self.play_zname + \
+            ' = ' + str(self.data[self.play_zname][ind])
+
+        self.play_ind = ind
+
+    def seek_playback(self, attr, old, new):
+
+        """
+        Handle slider changes for a streamed volume
+        """
+
+        if new == self.play_ind:  # Moved by playback
+            return
+
+        if self.prefetcher.error is not None:
+            self.stat_box.text = '<font color="red">Error: could not get slice</font>'
+            return
+
+        self.play_ind = new  # Playback continues from here
+        self.play_pending = new
+        frame = self.prefetcher.seek(new)
+        if frame is not None:
+            self.show_pending(new)
+        else:  # Fetched next and shown when it arrives
+            self.update_play_stat()
+
+    def slice_fetched(self, ind):
+
+        """
+        Schedule showing a slice sought before it was fetched (called from the
+        prefetcher thread)
+        """
+
+        if ind == self.play_pending:
+            self.doc.add_next_tick_callback(partial(self.show_pending, ind))
+
+    def show_pending(self, ind):
+
+        """
+        Show the slice sought last if it is still wanted
+        """
+
+        if (self.prefetcher is None) or (ind != self.play_pending):
+            return
+
+        frame = self.prefetcher.seek(ind)
+        if frame is not None:
+            self.play_pending = None
+            self.show_frame(ind, frame)
+            self.update_play_stat()
+
+    def toggle_playback(self):
+
+        """
+        Play or pause
+        """
+
+        if self.play_cb is None:
+            self.start_playback()
+        else:
+            self.pause_playback()
+
+    def start_playback(self):
+
+        """
+        Start stepping through the slices at the frame rate entered
+        """
+
+        try:
+            self.play_fps = float(self.fps_box.value)
+        except ValueError:
+            self.play_fps = 0
+        if self.play_fps <= 0:
+            self.stat_box.text = '<font color="red">Error: invalid frame rate</font>'
+            return
+
+        self.play_ind = self.play_slider.value
+        self.play_pending = None
+        self.play_last = None
+        self.play_cb = self.doc.add_periodic_callback(self.play_tick, max(1, round(1000 / self.play_fps)))
+        self.play_btn.label = 'Pause'
+
+    def pause_playback(self):
+
+        """
+        Stop stepping through the slices
+        """
+
+        if self.play_cb is not None:
+            self.doc.remove_periodic_callback(self.play_cb)
+            self.play_cb = None
+        self.play_btn.label = 'Play'
+
+    def stop_playback(self):
+
+        """
+        Stop playback and any background fetching and reset the counters
+        """
+
+        self.pause_playback()
+        if self.prefetcher is not None:
+            self.prefetcher.stop(wait=False)  # Do not hold up the server
+            self.prefetcher = None
+        self.play_slider = None
+        self.play_pending = None
+        self.play_slice_lims = False
+        self.play_widen_lims = False
+        self.play_btn.disabled = True
+
+        self.play_frames = 0
+        self.play_dropped = 0
+        self.play_stat.text = ''
+
+    def change_frame_rate(self, attr, old, new):
+
+        """
+        Apply a new frame rate if playing
+        """
+
+        if self.play_cb is not None:
+            self.pause_playback()
+            self.start_playback()
+
+    def play_tick(self):
+
+        """
+        Advance playback (periodic callback). If the callback is late the
+        frames that should have been shown in the meantime are dropped; if
+        a streamed slice is not in the buffer the current frame is held.
+        """
+
+        if (self.prefetcher is not None) and (self.prefetcher.error is not None):
+            self.pause_playback()
+            self.stat_box.text = '<font color="red">Error: could not get slice for playback</font>'
+            return
+
+        now = time.perf_counter()
+        steps = 1
+        if self.play_last is not None:
+            steps = max(1, round((now - self.play_last) * self.play_fps))
+        self.play_last = now
+
+        ind = (self.play_ind + steps) % (self.play_slider.end + 1)
+
+        if self.prefetcher is not None:
+            frame = self.prefetcher.get(ind)
+            if frame is None:  # Underrun
+                self.update_play_stat()
+                return
+            self.play_pending = None
+            self.show_frame(ind, frame)
+
+        self.play_ind = ind
+        self.play_slider.value = ind
+        self.play_frames += 1
+        self.play_dropped += steps - 1
+        self.update_play_stat()
+
+    def update_play_stat(self):
+
+        """
+        Report the playback counters
+        """
+
+        text = 'Frames: ' + str(self.play_frames) + ', dropped: ' + str(self.play_dropped)
+        if self.prefetcher is not None:
+            text += ', underruns: ' + str(self.prefetcher.underruns) + \
+                ', buffered: ' + str(self.prefetcher.num_buffered()) + '/' + str(self.prefetcher.depth)
+        self.play_stat.text = text
+
+    def session_destroyed(self, session_context):
+
+        """
+        Stop any background fetching and release any out-of-core volume
+        when the browser session closes
+        """
+
+        if self.prefetcher is not None:
+            self.prefetcher.stop(wait=False)
+        self.close_volume()
+
+    async def get_trans_data(self, xname, yname, revx, revy):
+
+        """
+        Get the transposed data (in the compute pool) and axes
         """
 
         all_dims = self.data[self.var_name].shape
@@ -699,8 +1764,7 @@ class App:
                 t_dims[dim] = self.plot_dims[pd_count]
                 pd_count += 1
 
-        data_t = self.data[self.var_name].copy().transpose(t_dims)
-        data_t = numpy.squeeze(data_t)
+        data_t = await self.pool.trans_data(self.data[self.var_name], t_dims, revx, revy)
 
         x_t = self.data[xname].copy()
         y_t = self.data[yname].copy()
@@ -709,18 +1773,6 @@ class App:
         if revy:
             y_t = numpy.flipud(y_t)
 
-        if len(self.plot_dims) == 2:
-            if revx:
-                data_t = numpy.fliplr(data_t)
-            if revy:
-                data_t = numpy.flipud(data_t)
-        else:
-            for dim in range(data_t.shape[0]):
-                if revx:
-                    data_t[dim] = numpy.fliplr(data_t[dim])
-                if revy:
-                    data_t[dim] = numpy.flipud(data_t[dim])
-
         return x_t, y_t, data_t
 
     def display_line_plot(self, revx, revy):
@@ -729,7 +1781,9 @@ class App:
         Display a line plot
         """
 
-        disp = figure(x_axis_label='Index', y_axis_label=self.var_name,
+        from bokeh.plotting import figure  # Imported on first plot
+
+        disp = figure(x_axis_label='Index', y_axis_label=self.get_data_label(),
                       height=self.line_plot_size[0], width=self.line_plot_size[0],
                       tools=["reset,pan,wheel_zoom,box_zoom,save"])
 
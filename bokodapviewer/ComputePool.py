@@ -0,0 +1,195 @@
+"""
+ComputePool class definition
+"""
+
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+from bokodapviewer.SharedArray import SharedArray
+from bokodapviewer.IngestStats import IngestStats
+
+
+def apply_attr_values(data, scale_factor, offset, fill_value, missing_value,
+                      stats=None, axis=None, first=0):
+
+    """
+    Apply attribute values (NaN if not present) to an array in place. If
+    stats are given, the array is processed a slice at a time along the axis
+    (as one slice if no axis is given) and the statistics of each slice are
+    gathered in the same pass, starting at slice index first.
+    """
+
+    if (stats is None) or (axis is None):
+        blocks = [data]
+    else:
+        blocks = numpy.moveaxis(data, axis, 0)
+
+    for ind, block in enumerate(blocks):
+        if not numpy.isnan(fill_value):
+            block[block == fill_value] = numpy.nan
+        if not numpy.isnan(missing_value):
+            block[block == missing_value] = numpy.nan
+        if not numpy.isnan(scale_factor):
+            block *= scale_factor
+        if not numpy.isnan(offset):
+            block += offset
+        if stats is not None:
+            stats.add_slice(first + ind, block)
+
+
+def trans_data(data, t_dims, revx, revy):
+
+    """
+    Transpose an array, remove singleton dimensions and reverse the x (last)
+    and y (second last) axes if required
+    """
+
+    data_t = numpy.squeeze(data.transpose(t_dims))
+    if revx:
+        data_t = numpy.flip(data_t, axis=-1)
+    if revy:
+        data_t = numpy.flip(data_t, axis=-2)
+
+    return data_t
+
+
+def _apply_attributes(spec, attrs, axis):
+
+    """
+    Worker: apply attribute values to a shared array in place and return
+    the statistics of its slices along the axis
+    """
+
+    data = SharedArray.attach(spec)
+    stats = IngestStats(1 if axis is None else data.shape[axis])
+    apply_attr_values(data, *attrs, stats=stats, axis=axis)
+
+    return stats
+
+
+def _trans_data(in_spec, out_spec, t_dims, revx, revy):
+
+    """
+    Worker: transpose a shared array into another
+    """
+
+    data = SharedArray.attach(in_spec)
+    data_t = SharedArray.attach(out_spec)
+    data_t[...] = trans_data(data, t_dims, revx, revy)
+
+
+def _interp_data(spec, x, y, nu_tol, ax_int):
+
+    """
+    Worker: interpolate a shared array onto a uniform grid. The result is
+    put in a new block unless no interpolation was needed.
+    """
+
+    from bokcolmaps.interp_data import interp_data  # Imported on first use
+
+    data = SharedArray.attach(spec)
+    x_i, y_i, data_i, ax_int, msg = interp_data(x, y, data, nu_tol=nu_tol, ax_int=ax_int)
+
+    out_spec = None
+    if data_i is not None:
+        if numpy.may_share_memory(data_i, data):
+            out_spec = spec
+        else:
+            out = SharedArray.create(data_i.shape, dtype=numpy.float32, own=False)
+            out[...] = data_i
+            out_spec = out.get_spec()
+
+    return x_i, y_i, out_spec, ax_int, msg
+
+
+class ComputePool:
+
+    """
+    Runs the CPU-heavy data transforms in a pool of processes shared by all
+    sessions in the server process, so one session's post-processing does
+    not hold up the event loop for the others. Arrays are passed to and from
+    the workers in shared memory rather than pickled.
+
+    With zero processes the transforms are run in the calling process.
+    """
+
+    _instance = None
+
+    def __init__(self, num_procs):
+
+        self.num_procs = num_procs
+
+        self.executor = None
+        if num_procs > 0:
+            self.executor = ProcessPoolExecutor(max_workers=num_procs,
+                                                mp_context=multiprocessing.get_context('spawn'))
+
+    @classmethod
+    def get(cls, num_procs):
+
+        """
+        Get the pool for this process, creating it on first use
+        """
+
+        if cls._instance is None:
+            cls._instance = cls(num_procs)
+
+        return cls._instance
+
+    async def run(self, func, *args):
+
+        """
+        Run a worker function in the pool
+        """
+
+        if self.executor is None:
+            return func(*args)
+
+        return await asyncio.wrap_future(self.executor.submit(func, *args))
+
+    async def apply_attributes(self, data, attrs, axis=None):
+
+        """
+        Apply attribute values (scale factor, offset, fill value, missing
+        value) to a shared array in place, returning the IngestStats of its
+        slices along the axis
+        """
+
+        return await self.run(_apply_attributes, data.get_spec(), attrs, axis)
+
+    async def trans_data(self, data, t_dims, revx, revy):
+
+        """
+        Get a transposed shared copy of an array (see trans_data)
+        """
+
+        data = SharedArray.copy_of(data)
+
+        shape = [data.shape[dim] for dim in t_dims if data.shape[dim] != 1]
+        data_t = SharedArray.create(shape, dtype=data.dtype)
+        await self.run(_trans_data, data.get_spec(), data_t.get_spec(), t_dims, revx, revy)
+
+        return data_t
+
+    async def interp_data(self, x, y, data, nu_tol, ax_int):
+
+        """
+        Interpolate a shared array onto a uniform grid if required (same
+        arguments and returns as bokcolmaps interp_data)
+        """
+
+        data = SharedArray.copy_of(data)
+
+        x_i, y_i, out_spec, ax_int, msg = await self.run(_interp_data, data.get_spec(),
+                                                         x, y, nu_tol, ax_int)
+
+        data_i = None
+        if out_spec == data.get_spec():
+            data_i = data
+        elif out_spec is not None:
+            data_i = SharedArray.attach(out_spec, own=True)
+
+        return x_i, y_i, data_i, ax_int, msg
@@ -0,0 +1,37 @@
+"""
+ConfigCache class definition
+"""
+
+import os
+import threading
+import xml.etree.ElementTree as et
+
+
+class ConfigCache:
+
+    """
+    Parsed xml configuration files shared by all sessions in the server
+    process. A file is only parsed again when its modification time changes.
+    The parsed trees must not be modified.
+    """
+
+    _cache = {}  # File path: (modification time, root element)
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, config_file):
+
+        """
+        Get the root element of a configuration file
+        """
+
+        path = os.path.abspath(config_file)
+        mtime = os.stat(path).st_mtime_ns
+
+        with cls._lock:
+            entry = cls._cache.get(path)
+            if (entry is None) or (entry[0] != mtime):
+                entry = (mtime, et.parse(path).getroot())
+                cls._cache[path] = entry
+
+        return entry[1]
@@ -0,0 +1,225 @@
+"""
+IngestStats class definition
+"""
+
+import numpy
+
+
+class IngestStats:
+
+    """
+    NaN-aware statistics of a variable and of each of its slices along one
+    axis: minimum, maximum, mean and a quantile sketch (the values at a fixed
+    set of percentile ranks, closely spaced in the tails, estimated from a
+    strided sample of at most about 10000 values). They are gathered
+    slice by slice as the data are ingested, so percentiles for colour
+    limits can be estimated later without another pass over the data.
+    Outliers only affect the ranks they occupy. Percentiles over all slices
+    are found from the count-weighted sum of the slice distributions.
+    """
+
+    # Maximum number of values per slice used for the quantile sketch
+    sample_size = 10000
+
+    # Percentile ranks kept for each slice
+    ranks = numpy.unique(numpy.round(numpy.concatenate([numpy.linspace(0, 10, 101),
+                                                        numpy.linspace(10, 90, 81),
+                                                        numpy.linspace(90, 100, 101)]), 6))
+
+    def __init__(self, num_slices):
+
+        self.num_slices = num_slices
+
+        self.mins = numpy.full(num_slices, numpy.nan)
+        self.maxs = numpy.full(num_slices, numpy.nan)
+        self.sums = numpy.zeros(num_slices)
+        self.counts = numpy.zeros(num_slices, dtype=numpy.int64)
+        self.quants = numpy.full((num_slices, self.ranks.size), numpy.nan, dtype=numpy.float32)
+
+    def add_slice(self, ind, data):
+
+        """
+        Gather the statistics of a slice
+        """
+
+        # Minimum and maximum skipping NaNs, without copying the data
+        vmin = numpy.fmin.reduce(data, axis=None)
+        if numpy.isnan(vmin):  # No values
+            self.counts[ind] = 0
+            return
+        vmax = numpy.fmax.reduce(data, axis=None)
+
+        # Sum along rows, then only go over the rows with NaNs again
+        rows = numpy.atleast_2d(data)
+        row_sums = numpy.add.reduce(rows, axis=-1)
+        count = data.size
+        nan_rows = numpy.isnan(row_sums)
+        if numpy.any(nan_rows):
+            bad = rows[nan_rows]
+            row_sums[nan_rows] = numpy.nansum(bad, axis=-1)
+            count -= numpy.count_nonzero(numpy.isnan(bad))
+        total = row_sums.sum(dtype=numpy.float64)
+
+        # The quantile sketch is taken from a strided sample, keeping the
+        # exact minimum and maximum at the ends
+        sample = data[self._get_sample_inds(data.shape)].ravel()
+        sample = numpy.sort(sample[~numpy.isnan(sample)])
+        if sample.size > 0:  # As numpy.percentile, which is slow for many ranks
+            quants = numpy.interp(self.ranks / 100 * (sample.size - 1), numpy.arange(sample.size), sample)
+        else:
+            quants = numpy.full(self.ranks.size, vmin)
+        quants[0], quants[-1] = vmin, vmax
+
+        self.mins[ind] = vmin
+        self.maxs[ind] = vmax
+        self.sums[ind] = total
+        self.quants[ind] = numpy.maximum.accumulate(numpy.clip(quants, vmin, vmax))
+        self.counts[ind] = count  # Last, as slices may be read while others are added
+
+    @classmethod
+    def _get_sample_inds(cls, shape):
+
+        """
+        Get slices taking every nth value along each dimension so that a
+        sample of an array has at most about sample_size values
+        """
+
+        size = int(numpy.prod(shape))
+        if size <= cls.sample_size:
+            return tuple(slice(None) for _ in shape)
+
+        step = int(numpy.ceil((size / cls.sample_size) ** (1 / len(shape))))
+
+        return tuple(slice(None, None, step) for _ in shape)
+
+    def add_slices(self, data, axis=None, first=0):
+
+        """
+        Gather the statistics of the slices of an array along an axis (the
+        whole array is one slice if no axis is given), starting at slice
+        index first
+        """
+
+        if axis is None:
+            self.add_slice(first, data)
+        else:
+            for ind, block in enumerate(numpy.moveaxis(data, axis, 0)):
+                self.add_slice(first + ind, block)
+
+    @classmethod
+    def gather(cls, data, axis=None):
+
+        """
+        Gather the statistics of an array in memory
+        """
+
+        stats = cls(1 if axis is None else data.shape[axis])
+        stats.add_slices(data, axis)
+
+        return stats
+
+    def num_gathered(self):
+
+        """
+        Get the number of slices with statistics gathered (slices without
+        finite values are not counted)
+        """
+
+        return int(numpy.count_nonzero(self.counts))
+
+    def get_min(self):
+
+        """
+        Get the minimum over all slices
+        """
+
+        return numpy.nanmin(self.mins) if self.counts.sum() > 0 else numpy.nan
+
+    def get_max(self):
+
+        """
+        Get the maximum over all slices
+        """
+
+        return numpy.nanmax(self.maxs) if self.counts.sum() > 0 else numpy.nan
+
+    def get_mean(self, ind=None):
+
+        """
+        Get the mean of a slice, or over all slices
+        """
+
+        count = self.counts.sum() if ind is None else self.counts[ind]
+        total = self.sums.sum() if ind is None else self.sums[ind]
+
+        return total / count if count > 0 else numpy.nan
+
+    def get_lims(self, lower=0, upper=100, ind=None):
+
+        """
+        Get estimates of the lower and upper percentiles of a slice, or over
+        all the slices gathered so far (NaN if there are no finite values)
+        """
+
+        if ind is not None:
+            if self.counts[ind] == 0:
+                return numpy.nan, numpy.nan
+            return (float(numpy.interp(lower, self.ranks, self.quants[ind])),
+                    float(numpy.interp(upper, self.ranks, self.quants[ind])))
+
+        return self._percentile(lower), self._percentile(upper)
+
+    def _cdf(self, val, quants, counts):
+
+        """
+        Get the fraction of the values over the given slices that are at or
+        below a value, interpolating linearly between the ranks kept
+        """
+
+        num_ranks = self.ranks.size
+        below = numpy.count_nonzero(quants <= val, axis=1)
+
+        ind = numpy.clip(below, 1, num_ranks - 1)
+        rows = numpy.arange(quants.shape[0])
+        q_0, q_1 = quants[rows, ind - 1], quants[rows, ind]
+        r_0, r_1 = self.ranks[ind - 1], self.ranks[ind]
+
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            frac = numpy.where(q_1 > q_0, numpy.clip((val - q_0) / (q_1 - q_0), 0, 1), 1)
+        rank = r_0 + frac * (r_1 - r_0)
+        rank = numpy.where(below == 0, 0, numpy.where(below == num_ranks, 100, rank))
+
+        return (counts * rank).sum() / (100 * counts.sum())
+
+    def _percentile(self, pct):
+
+        """
+        Estimate a percentile over all slices by bisection on the combined
+        distribution
+        """
+
+        used = self.counts > 0
+        if not numpy.any(used):
+            return numpy.nan
+
+        vmin, vmax = self.get_min(), self.get_max()
+        if pct <= 0:
+            return float(vmin)
+        if pct >= 100:
+            return float(vmax)
+
+        quants = self.quants[used].astype(numpy.float64)
+        counts = self.counts[used].astype(numpy.float64)
+        target = pct / 100
+
+        low, high = float(vmin), float(vmax)
+        for _ in range(60):
+            mid = 0.5 * (low + high)
+            if (mid <= low) or (mid >= high):  # Converged to float precision
+                break
+            if self._cdf(mid, quants, counts) < target:
+                low = mid
+            else:
+                high = mid
+
+        return high
@@ -0,0 +1,119 @@
+"""
+MappedVolume class definition
+"""
+
+import os
+import tempfile
+
+import numpy
+
+
+class MappedVolume:
+
+    """
+    A float32 volume held in a temporary memory-mapped file rather than in
+    memory, laid out slice-major (slices along the first axis are contiguous
+    in the file). Reading a slice, or a line through all the slices, only
+    reads the pages holding those values. The file has no name and its space
+    is freed when the volume and any views of it are deleted.
+
+    The file must be on disk for the volume to be larger than memory. By
+    default it goes in /var/tmp where that is writable, as /tmp is often a
+    RAM-backed tmpfs, and otherwise in the system temporary directory.
+    """
+
+    def __init__(self, shape, dir_name=None):
+
+        if (dir_name is None) and os.access('/var/tmp', os.W_OK):
+            dir_name = '/var/tmp'
+
+        with tempfile.TemporaryFile(dir=dir_name) as file:
+            # The mapping keeps the file open after it is closed here
+            self.data = numpy.memmap(file, dtype=numpy.float32, mode='w+', shape=tuple(shape))
+
+        self.shape = self.data.shape
+        self.num_slices = self.shape[0]
+
+    @classmethod
+    def get_shape(cls, shape, axis):
+
+        """
+        Get the volume shape for an array of the given shape with slices
+        along an axis (any other singleton dimensions are dropped)
+        """
+
+        rest = [shape[dim] for dim in range(len(shape)) if (dim != axis) and (shape[dim] > 1)]
+
+        return [shape[axis]] + rest
+
+    def put_slices(self, first, data, axis):
+
+        """
+        Write the slices of an array along an axis, starting at slice index
+        first
+        """
+
+        data = numpy.moveaxis(data, axis, 0)
+        self.data[first:first + data.shape[0]] = data.reshape((data.shape[0],) + self.shape[1:])
+
+    def get_slice(self, ind):
+
+        """
+        Get a copy of a slice
+        """
+
+        return numpy.array(self.data[ind])
+
+    def get_line(self, inds):
+
+        """
+        Get a copy of the line through all the slices at the given indices
+        in the other dimensions
+        """
+
+        return numpy.array(self.data[(slice(None),) + tuple(inds)])
+
+    def get_section(self, rows, cols, row_vals, col_vals):
+
+        """
+        Get the section through all the slices along a track, interpolated
+        bilinearly at points given in the coordinates of the rows and columns
+        of the slices (rows and cols are the coordinate axes, which may be
+        ascending or descending). Only the values at the grid points around
+        the track are read. The result has one column per point.
+        """
+
+        r_0, r_1, r_w = self._get_interp_inds(rows, row_vals)
+        c_0, c_1, c_w = self._get_interp_inds(cols, col_vals)
+
+        section = (1 - r_w) * (1 - c_w) * self.data[:, r_0, c_0]
+        section += (1 - r_w) * c_w * self.data[:, r_0, c_1]
+        section += r_w * (1 - c_w) * self.data[:, r_1, c_0]
+        section += r_w * c_w * self.data[:, r_1, c_1]
+
+        return section.astype(numpy.float32)
+
+    @staticmethod
+    def _get_interp_inds(axis, vals):
+
+        """
+        Get the indices of the axis values either side of each value (clipped
+        to the ends of the axis) and the weights of the second ones
+        """
+
+        if axis.size == 1:
+            zeros = numpy.zeros(len(vals), dtype=int)
+            return zeros, zeros, numpy.zeros(len(vals))
+
+        desc = axis[-1] < axis[0]
+        if desc:
+            axis = axis[::-1]
+
+        ind_1 = numpy.clip(numpy.searchsorted(axis, vals), 1, axis.size - 1)
+        ind_0 = ind_1 - 1
+        weight = numpy.clip((vals - axis[ind_0]) / (axis[ind_1] - axis[ind_0]), 0, 1)
+
+        if desc:
+            ind_0, ind_1 = axis.size - 1 - ind_0, axis.size - 1 - ind_1
+
+        return ind_0, ind_1, weight
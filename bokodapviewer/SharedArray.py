@@ -0,0 +1,118 @@
+"""
+SharedArray class definition
+"""
+
+import weakref
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy
+
+
+class SharedArray(numpy.ndarray):
+
+    """
+    A NumPy array whose data are held in a shared memory block, so it can be
+    handed to other processes by name rather than pickled.
+
+    One process owns each block: the block is unlinked when the owning array
+    is deleted, but stays mapped until all views of it have been deleted,
+    after which the memory is freed.
+    """
+
+    def __array_finalize__(self, obj):
+
+        # Only views of the block keep it alive; copies and ufunc results
+        # (which may still have a base) hold their own data
+        shm = getattr(obj, 'shm', None)
+        if (shm is not None) and \
+           not numpy.may_share_memory(self, numpy.frombuffer(shm.buf, dtype=numpy.uint8)):
+            shm = None
+        self.shm = shm
+
+    @classmethod
+    def create(cls, shape, dtype=numpy.float32, own=True):
+
+        """
+        Create an uninitialised array in a new shared memory block. If the
+        array does not own the block, another process must attach to it as
+        owner or it will not be unlinked.
+        """
+
+        dtype = numpy.dtype(dtype)
+        size = max(1, int(numpy.prod(shape)) * dtype.itemsize)
+        shm = SharedMemory(create=True, size=size)
+
+        return cls._from_shm(shm, shape, dtype, own)
+
+    @classmethod
+    def attach(cls, spec, own=False):
+
+        """
+        Attach to an existing block given its spec (see get_spec)
+        """
+
+        name, shape, dtype = spec
+        shm = SharedMemory(name=name)
+
+        return cls._from_shm(shm, shape, numpy.dtype(dtype), own)
+
+    @classmethod
+    def _from_shm(cls, shm, shape, dtype, own):
+
+        """
+        Wrap a block as an array
+        """
+
+        arr = numpy.ndarray(shape, dtype=dtype, buffer=shm.buf).view(cls)
+        arr.shm = shm
+
+        if own:
+            weakref.finalize(arr, _unlink, shm)
+
+        return arr
+
+    @classmethod
+    def copy_of(cls, data):
+
+        """
+        Get a shared array with the data (the array itself if it already owns
+        a whole block)
+        """
+
+        if isinstance(data, cls) and data.owns_block():
+            return data
+
+        arr = cls.create(data.shape, dtype=data.dtype)
+        arr[...] = data
+
+        return arr
+
+    def owns_block(self):
+
+        """
+        True if the array is a C-contiguous view of the whole of its block
+        """
+
+        return (self.shm is not None) and self.flags['C_CONTIGUOUS'] and \
+            (self.__array_interface__['data'][0] ==
+             numpy.frombuffer(self.shm.buf, dtype=numpy.uint8, count=1).__array_interface__['data'][0])
+
+    def get_spec(self):
+
+        """
+        Get the details needed to attach to the block from another process
+        """
+
+        return self.shm.name, self.shape, self.dtype.str
+
+
+def _unlink(shm):
+
+    """
+    Unlink a block (called when its owning array is deleted)
+    """
+
+    try:
+        shm.unlink()
+    except FileNotFoundError:  # Already unlinked
+        pass
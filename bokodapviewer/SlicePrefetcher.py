@@ -0,0 +1,175 @@
+"""
+SlicePrefetcher class definition
+"""
+
+import threading
+from collections import OrderedDict
+
+
+class SlicePrefetcher:
+
+    """
+    Fetches slices of a volume in a background thread, keeping a ring buffer
+    of the slices ahead of a playhead. Playback loops, so the slices after
+    the last one are the first ones again.
+
+    Slices are obtained by calling get_slice(index), and on_fetch(index) (if
+    given) is called from the thread after each one is buffered. Requesting a
+    slice for playback with get() moves the playhead there; a request for a
+    slice that is not yet in the buffer is counted as an underrun, once for
+    each slice waited for. Moving the playhead with seek() puts the slice
+    first in the queue and is not counted.
+    """
+
+    def __init__(self, get_slice, num_slices, depth=8, on_fetch=None):
+
+        self.get_slice = get_slice
+        self.num_slices = num_slices
+        self.depth = max(1, min(depth, num_slices))
+        self.on_fetch = on_fetch
+
+        self.buffer = OrderedDict()  # Slice index: slice
+        self.playhead = 0
+        self.underruns = 0
+        self.error = None
+
+        self._stalled = None  # Slice index last waited for
+
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+
+        """
+        Start the background thread
+        """
+
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+
+        """
+        Stop the background thread. If wait, wait for any slice being
+        fetched; otherwise the thread finishes it and exits by itself.
+        """
+
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+
+        if wait and (self._thread is not None) and (self._thread is not threading.current_thread()):
+            self._thread.join()
+        self._thread = None
+
+    def put(self, index, data):
+
+        """
+        Add a slice to the buffer (e.g. one fetched outside the thread)
+        """
+
+        with self._cond:
+            if index in self._window():
+                self.buffer[index] = data
+                self._cond.notify_all()
+
+    def get(self, index):
+
+        """
+        Move the playhead to a slice and return it, or None if it has not
+        been fetched yet
+        """
+
+        with self._cond:
+            self._move(index)
+            data = self.buffer.get(index)
+            if data is None:
+                if index != self._stalled:
+                    self.underruns += 1
+                    self._stalled = index
+            else:
+                self._stalled = None
+            return data
+
+    def seek(self, index):
+
+        """
+        Move the playhead and return the slice, or None if it has not been
+        fetched yet (it is fetched next)
+        """
+
+        with self._cond:
+            self._move(index)
+            self._stalled = None
+            return self.buffer.get(index)
+
+    def num_buffered(self):
+
+        """
+        Get the number of slices currently buffered
+        """
+
+        with self._cond:
+            return len(self.buffer)
+
+    def _window(self):
+
+        """
+        Get the slice indices that should be buffered, nearest first
+        """
+
+        return [(self.playhead + ind) % self.num_slices for ind in range(self.depth)]
+
+    def _move(self, index):
+
+        """
+        Move the playhead and evict slices that have fallen out of the window
+        (must be called with the lock held)
+        """
+
+        self.playhead = index % self.num_slices
+        window = self._window()
+        for ind in list(self.buffer.keys()):
+            if ind not in window:
+                del self.buffer[ind]
+        self._cond.notify_all()
+
+    def _run(self):
+
+        """
+        Fetch the nearest missing slice in the window until stopped
+        """
+
+        while True:
+
+            with self._cond:
+                index = None
+                while self._running:
+                    missing = [ind for ind in self._window() if ind not in self.buffer]
+                    if len(missing) > 0:
+                        index = missing[0]
+                        break
+                    self._cond.wait()
+                if not self._running:
+                    return
+
+            try:
+                data = self.get_slice(index)
+            except Exception as err:
+                with self._cond:
+                    self.error = err
+                    self._running = False
+                return
+
+            with self._cond:
+                if not self._running:
+                    return
+            self.put(index, data)
+            if self.on_fetch is not None:
+                self.on_fetch(index)
@@ -0,0 +1,105 @@
+"""
+StreamReducer class definition
+"""
+
+import numpy
+
+
+class StreamReducer:
+
+    """
+    Nan-aware reduction of an array along one axis, accumulated chunk by
+    chunk. Chunks are successive sections of the array along the reduction
+    axis, so only the current chunk and the accumulator need to be held in
+    memory whatever the length of that axis.
+
+    The reduced axis is kept as a singleton. Available reductions are
+    'mean', 'min', 'max', 'std' (population standard deviation) and 'count'
+    (number of non-NaN values). Mean and standard deviation are accumulated
+    with the pairwise update of Chan et al. so the result does not depend on
+    the chunking.
+    """
+
+    ops = ['mean', 'min', 'max', 'std', 'count']
+
+    def __init__(self, op, axis):
+
+        if op not in self.ops:
+            raise ValueError('StreamReducer: unknown reduction ' + str(op))
+
+        self.op = op
+        self.axis = axis
+
+        self.count = None  # Number of non-NaN values
+        self.acc = None  # Running min, max, count or mean
+        self.m2 = None  # Running sum of squared deviations from the mean
+
+    def update(self, chunk):
+
+        """
+        Add a chunk of data to the accumulator
+        """
+
+        count = numpy.sum(~numpy.isnan(chunk), axis=self.axis, keepdims=True)
+
+        if self.op in ('min', 'max'):
+
+            ufunc = numpy.fmin if self.op == 'min' else numpy.fmax
+            red = ufunc.reduce(chunk, axis=self.axis, keepdims=True)
+            self.acc = red if self.acc is None else ufunc(self.acc, red)
+
+        elif self.op == 'count':
+
+            self.acc = count if self.acc is None else self.acc + count
+
+        else:
+
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                mean = numpy.nansum(chunk, axis=self.axis, keepdims=True,
+                                    dtype=numpy.float64) / count
+                m2 = numpy.nansum((chunk - mean) ** 2, axis=self.axis,
+                                  keepdims=True, dtype=numpy.float64)
+
+            if self.acc is None:
+                self.count, self.acc, self.m2 = count, mean, m2
+            else:
+                total = self.count + count
+                with numpy.errstate(invalid='ignore', divide='ignore'):
+                    delta = mean - self.acc
+                    frac = count / total
+                    new_mean = self.acc + delta * frac
+                    new_m2 = self.m2 + m2 + delta ** 2 * self.count * frac
+                self.acc = numpy.where(count == 0, self.acc,
+                                       numpy.where(self.count == 0, mean, new_mean))
+                self.m2 = numpy.where(count == 0, self.m2,
+                                      numpy.where(self.count == 0, m2, new_m2))
+                self.count = total
+
+    def result(self):
+
+        """
+        Get the reduced data (float32, reduced axis kept as a singleton)
+        """
+
+        if self.acc is None:
+            return None
+
+        if self.op == 'std':
+            with numpy.errstate(invalid='ignore', divide='ignore'):
+                res = numpy.where(self.count > 0,
+                                  numpy.sqrt(self.m2 / self.count), numpy.nan)
+        else:
+            res = self.acc
+
+        return res.astype(numpy.float32)
+
+    @classmethod
+    def reduce(cls, data, op, axis):
+
+        """
+        Reduce an in-memory array in a single step
+        """
+
+        reducer = cls(op, axis)
+        reducer.update(data)
+        return reducer.result()
@@ -0,0 +1,79 @@
+"""
+VarIndex class definition
+"""
+
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+class VarIndex:
+
+    """
+    Index of the variables in a DDS, for searching by name (prefix or
+    substring, case-insensitive) and by dimension name. Variables are kept
+    in name order and search results are lists of positions in that order.
+    """
+
+    def __init__(self, dds):
+
+        self.names = sorted(dds.keys())
+        self.entries = [dds[name] for name in self.names]  # Type, dimensions, dimension names
+
+        self._lower = [name.lower() for name in self.names]
+
+        # Lower case names in sorted order for prefix searches
+        sorted_lower = sorted(zip(self._lower, range(len(self.names))))
+        self._prefix_keys = [key for key, _ in sorted_lower]
+        self._prefix_inds = [ind for _, ind in sorted_lower]
+
+        # Variables using each dimension
+        self._by_dim = {}
+        for ind, entry in enumerate(self.entries):
+            for dim_name in set(entry[2]):  # Once per variable
+                self._by_dim.setdefault(dim_name, []).append(ind)
+        self.dim_names = sorted(self._by_dim.keys())
+
+    def __len__(self):
+
+        return len(self.names)
+
+    def search(self, text='', prefix=False, dim_name=None):
+
+        """
+        Get the positions of the variables whose names contain (or start
+        with, if prefix) the text and which have the dimension name if given
+        """
+
+        text = text.lower()
+
+        if dim_name is not None:
+            inds = self._by_dim.get(dim_name, [])
+        else:
+            inds = range(len(self.names))
+
+        if len(text) == 0:
+            return list(inds)
+
+        if prefix:
+            start = bisect_left(self._prefix_keys, text)
+            end = start
+            while (end < len(self._prefix_keys)) and self._prefix_keys[end].startswith(text):
+                end += 1
+            matches = set(self._prefix_inds[start:end])
+            return [ind for ind in inds if ind in matches]
+
+        return [ind for ind in inds if text in self._lower[ind]]
+
+    def get_rows(self, inds):
+
+        """
+        Get the DDS table columns for the variables at the given positions
+        """
+
+        odt = OrderedDict()
+        odt['Variable Name'] = [self.names[ind] for ind in inds]
+        odt['Type'] = [self.entries[ind][0] for ind in inds]
+        odt['Dimensions'] = [self.entries[ind][1] for ind in inds]
+        odt['Dimension Names'] = [self.entries[ind][2] for ind in inds]
+
+        return odt